@@ -9,141 +9,88 @@ At each depth, all internal links are discovered and crawled in parallel, up to
 Usage: Set the start URL and max_depth in main(), then run as a script.
 """
 import asyncio
-from urllib.parse import urldefrag, urlparse
 import os
-import re
 from crawl4ai import (
     AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode,
     MemoryAdaptiveDispatcher
 )
-
-def create_filename_from_url(url: str) -> str:
-    """
-    Creates a filename from URL path after the domain
-    
-    Args:
-        url (str): The full URL
-        
-    Returns:
-        str: Filename for the content
-    """
-    parsed = urlparse(url)
-    path = parsed.path
-    
-    if path.startswith('/'):
-        path = path[1:]
-    
-    if not path or path == '':
-        filename = 'index'
-    else:
-        filename = path.replace('/', '_').replace('\\', '_')
-        filename = re.sub(r'[^\w\-_.]', '_', filename)
-    
-    if not filename.endswith('.md'):
-        filename += '.md'
-    
-    return filename
-
-def save_content_to_file(content: str, url: str, base_folder: str, depth: int):
-    """
-    Saves the scraped content to a file in the specified folder structure.
-    
-    Args:
-        content (str): The markdown content to save
-        url (str): The original URL
-        base_folder (str): The base folder name (e.g., 'www.youxel.com')
-        depth (int): The crawling depth for organizing files (not used anymore)
-    """
-    try:
-        # Create the base folder if it doesn't exist
-        if not os.path.exists(base_folder):
-            os.makedirs(base_folder)
-        
-        filename = create_filename_from_url(url)
-        filepath = os.path.join(base_folder, filename)
-        
-        if os.path.exists(filepath):
-            print(f"File already exists, skipping: {filepath}")
-            return
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
-        
-        print(f"Saved content to: {filepath}")
-        
-    except Exception as e:
-        print(f"Error saving content for {url}: {e}")
-
-def extract_domain_from_url(url: str) -> str:
-    """
-    Extracts the domain name from the URL to use as folder name.
-    
-    Args:
-        url (str): The URL
-        
-    Returns:
-        str: Domain name to use as folder name
-    """
-    parsed = urlparse(url)
-    domain = parsed.netloc
-    return domain
+from crawl_utils import logger, start_logging, stop_logging, run_async, resolve_concurrency, dispatcher_check_interval, memory_threshold_percent, LEAN_BROWSER_ARGS, create_filename_from_url, save_content_to_file, extract_domain_from_url
 
 async def crawl_recursive_batch(start_urls, max_depth=3, max_concurrent=10):
     # Extract base folder name from the first start URL
     base_folder = extract_domain_from_url(start_urls[0]) if start_urls else "crawled_content"
-    print(f"Saving content to folder: {base_folder}")
+    logger.info(f"Saving content to folder: {base_folder}")
+    os.makedirs(base_folder, exist_ok=True)
+    # Filenames already on disk, so pages are never written twice
+    written = set(os.listdir(base_folder))
+    max_concurrent = resolve_concurrency(max_concurrent)
+    logger.info(f"Max concurrent sessions: {max_concurrent}")
     
-    browser_config = BrowserConfig(headless=True, verbose=False)
+    browser_config = BrowserConfig(headless=True, verbose=False, extra_args=LEAN_BROWSER_ARGS)
     run_config = CrawlerRunConfig(
         cache_mode=CacheMode.BYPASS,
-        stream=False
+        stream=True     # Handle each page as it finishes instead of holding the whole depth
     )
     dispatcher = MemoryAdaptiveDispatcher(
-        memory_threshold_percent=70.0,      # Don't exceed 70% memory usage
-        check_interval=1.0,                 # Check memory every second
-        max_session_permit=max_concurrent   # Max parallel browser sessions
+        memory_threshold_percent=memory_threshold_percent(),       # Throttle above this share of system memory
+        check_interval=dispatcher_check_interval(max_concurrent),  # Seconds between memory checks
+        max_session_permit=max_concurrent                          # Max parallel browser sessions
     )
 
     # Track visited URLs to prevent revisiting and infinite loops (ignoring fragments)
     visited = set()
     def normalize_url(url):
-        return urldefrag(url)[0]
+        # Same as urldefrag(url)[0] but without parsing the whole URL for every link
+        return url.partition('#')[0]
     current_urls = set([normalize_url(u) for u in start_urls])
 
+    save_tasks = []
+
     async with AsyncWebCrawler(config=browser_config) as crawler:
         for depth in range(max_depth):
-            print(f"\n=== Crawling Depth {depth+1} ===")
-            urls_to_crawl = [normalize_url(url) for url in current_urls if normalize_url(url) not in visited]
+            logger.info(f"\n=== Crawling Depth {depth+1} ===")
+            # current_urls is normalized and already excludes visited URLs
+            urls_to_crawl = list(current_urls)
 
             if not urls_to_crawl:
                 break
 
-            # Batch-crawl all URLs at this depth in parallel
-            results = await crawler.arun_many(
+            next_level_urls = set()
+
+            # Crawl all URLs at this depth in parallel, streaming results as they finish
+            async for result in await crawler.arun_many(
                 urls=urls_to_crawl,
                 config=run_config,
                 dispatcher=dispatcher
-            )
-
-            next_level_urls = set()
-
-            for result in results:
+            ):
                 norm_url = normalize_url(result.url)
                 visited.add(norm_url)  
                 if result.success:
-                    print(f"[OK] {result.url} | Markdown: {len(result.markdown) if result.markdown else 0} chars")
-                    # Save the content to file
-                    save_content_to_file(result.markdown.raw_markdown, result.url, base_folder, depth+1)
-                    # Collect all new internal links for the next depth
-                    for link in result.links.get("internal", []):
-                        next_url = normalize_url(link["href"])
-                        if next_url not in visited:
-                            next_level_urls.add(next_url)
+                    logger.info(f"[OK] {result.url} | Markdown: {len(result.markdown) if result.markdown else 0} chars")
+                    # Save the content to file in a worker thread
+                    filename = create_filename_from_url(result.url)
+                    if filename in written:
+                        logger.info(f"File already exists, skipping: {os.path.join(base_folder, filename)}")
+                    else:
+                        written.add(filename)
+                        save_tasks.append(asyncio.create_task(asyncio.to_thread(
+                            save_content_to_file, result.markdown.raw_markdown, result.url, base_folder
+                        )))
+                    # Collect all internal links for the next depth; visited ones are removed below
+                    next_level_urls.update(normalize_url(link["href"]) for link in result.links.get("internal", ()))
                 else:
-                    print(f"[ERROR] {result.url}: {result.error_message}")
+                    logger.error(f"[ERROR] {result.url}: {result.error_message}")
+                # Free this result now rather than holding it until the next one arrives
+                del result
                     
-            # Move to the next set of URLs for the next recursion depth
-            current_urls = next_level_urls
+            # Move to the next set of URLs for the next recursion depth, in one set difference
+            current_urls = next_level_urls - visited
+
+        await asyncio.gather(*save_tasks)
 
 if __name__ == "__main__":
-    asyncio.run(crawl_recursive_batch(["https://medium.com/@yousefhosni"], max_depth=2, max_concurrent=10))
\ No newline at end of file
+    start_logging()
+    try:
+        run_async(crawl_recursive_batch(["https://medium.com/@yousefhosni"], max_depth=2, max_concurrent=10))
+    finally:
+        stop_logging()
\ No newline at end of file
@@ -0,0 +1,393 @@
+"""
+crawl_utils.py
+--------------
+Helpers shared by the crawl scripts: the crawl logger, memory tracking
+(MemoryMonitor), sizing concurrency and dispatcher settings from the host,
+running the crawl on uvloop (run_async), turning URLs into output filenames,
+saving markdown to disk and streaming page URLs out of a sitemap.
+"""
+import os
+import sys
+import queue
+import asyncio
+import logging
+import logging.handlers
+import time
+import psutil
+import requests
+from typing import List, Tuple
+from urllib.parse import urlsplit
+try:
+    from lxml import etree as ElementTree
+    HAS_LXML = True
+except ImportError:
+    from xml.etree import ElementTree
+    HAS_LXML = False
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; MemoryMonitor falls back to the sampled peak
+    resource = None
+
+# Shared by all the crawl scripts. Writes straight to stdout until start_logging()
+# moves the output onto a background thread
+logger = logging.getLogger("crawl")
+_stdout_handler = logging.StreamHandler(sys.stdout)
+_stdout_handler.setFormatter(logging.Formatter("%(message)s"))
+logger.addHandler(_stdout_handler)
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_log_listener = None
+
+class _SanitizeTable(dict):
+    """
+    str.translate table that maps every character except word characters, '-' and '.' to '_'.
+    Entries are filled in the first time a character is seen, so any Unicode input works.
+    """
+    def __missing__(self, codepoint: int):
+        char = chr(codepoint)
+        # Same character class as the regex [\w\-_.]
+        value = codepoint if char.isalnum() or char in '-_.' else '_'
+        self[codepoint] = value
+        return value
+
+# Characters that are not safe to keep in a filename (including '/' and '\\')
+_SANITIZE_TABLE = _SanitizeTable()
+
+def _positive_int_from_env(name: str, default: int) -> int:
+    """
+    Reads a positive integer setting from the environment.
+
+    Args:
+        name (str): The environment variable
+        default (int): Value to use when it is unset or not an integer
+
+    Returns:
+        int: The setting, at least 1
+    """
+    raw = os.environ.get(name)
+    if not raw:
+        return default
+    try:
+        return max(1, int(raw))
+    except ValueError:
+        logger.warning(f"Ignoring {name}={raw!r}, expected an integer; using {default}")
+        return default
+
+# Pages a browser session serves before it is closed and replaced, to bound Chromium memory
+BROWSER_MAX_USAGE = _positive_int_from_env("CRAWL4AI_BROWSER_MAX_USAGE", 100)
+
+# Seconds between RSS readings in MemoryMonitor; logs in between reuse the last reading
+MEMORY_SAMPLE_INTERVAL = 5.0
+
+# Chromium flags for crawling text: no images, sync, translate, extensions or audio
+LEAN_BROWSER_ARGS = [
+    "--blink-settings=imagesEnabled=false",
+    "--disable-background-networking",
+    "--disable-sync",
+    "--disable-translate",
+    "--mute-audio",
+    "--disable-extensions",
+]
+
+# The sitemap scripts also run without the GPU, /dev/shm or the renderer sandbox
+BROWSER_ARGS = ["--disable-gpu", "--disable-dev-shm-usage", "--no-sandbox"] + LEAN_BROWSER_ARGS
+
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+SITEMAP_LOC_TAG = SITEMAP_NS + 'loc'
+SITEMAP_TAG = SITEMAP_NS + 'sitemap'
+SITEMAP_INDEX_TAG = SITEMAP_NS + 'sitemapindex'
+# Child sitemaps fetched at once when expanding a sitemap index
+SITEMAP_FETCH_CONCURRENCY = 10
+
+# One pooled session for every sitemap request, so keep-alive connections are reused
+_SESSION = requests.Session()
+
+def start_logging() -> logging.handlers.QueueListener:
+    """
+    Sends the crawl log through a queue to a background thread that writes it to stdout,
+    so coroutines only enqueue records and never wait on the terminal.
+    Calling it again while the listener is running returns the same listener.
+
+    Returns:
+        QueueListener: The running listener; call stop_logging() to flush it before exiting
+    """
+    global _log_listener
+    if _log_listener is None:
+        log_queue = queue.Queue()
+        _log_listener = logging.handlers.QueueListener(log_queue, _stdout_handler, respect_handler_level=True)
+        logger.removeHandler(_stdout_handler)
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        _log_listener.start()
+    return _log_listener
+
+def stop_logging():
+    """
+    Flushes and stops the background log writer, and goes back to writing straight to stdout.
+    """
+    global _log_listener
+    if _log_listener is None:
+        return
+    _log_listener.stop()
+    for handler in list(logger.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            logger.removeHandler(handler)
+    logger.addHandler(_stdout_handler)
+    _log_listener = None
+
+class MemoryMonitor:
+    """
+    Logs the current and peak memory usage of this process.
+    The current RSS is read through psutil at most once every MEMORY_SAMPLE_INTERVAL seconds.
+    The peak comes from getrusage, which the kernel tracks on its own, so it's exact between readings.
+    """
+    def __init__(self):
+        self.process = psutil.Process(os.getpid())
+        self.current_memory = 0
+        self._sampled_peak = 0
+        self._last_sample = None
+
+    @property
+    def peak_memory(self) -> int:
+        """Peak RSS in bytes."""
+        if resource is None:
+            return self._sampled_peak
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes everywhere else
+        return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+    def log(self, prefix: str = "", fresh: bool = False):
+        """
+        Logs memory usage, reading the RSS again only if the last reading is stale.
+
+        Args:
+            prefix (str): Text to put before the numbers
+            fresh (bool): Always take a new reading, e.g. for the final summary
+        """
+        now = time.monotonic()
+        if fresh or self._last_sample is None or now - self._last_sample >= MEMORY_SAMPLE_INTERVAL:
+            self.current_memory = self.process.memory_info().rss
+            self._sampled_peak = max(self._sampled_peak, self.current_memory)
+            self._last_sample = now
+        logger.info(f"{prefix} Current Memory: {self.current_memory // (1024 * 1024)} MB, Peak: {self.peak_memory // (1024 * 1024)} MB")
+
+def resolve_concurrency(requested: int) -> int:
+    """
+    Caps the requested number of parallel browser sessions at four per CPU this process can run on.
+
+    Args:
+        requested (int): The concurrency asked for by the caller
+
+    Returns:
+        int: The concurrency to use, never above the request and with a cap of at least 4
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # sched_getaffinity only exists on Linux
+        cpus = os.cpu_count() or 1
+    return min(requested, max(4, cpus * 4))
+
+def dispatcher_check_interval(max_concurrent: int) -> float:
+    """
+    Picks how often MemoryAdaptiveDispatcher checks memory: often when many sessions
+    can start at once, rarely for small pools where checks would just cost CPU.
+
+    Args:
+        max_concurrent (int): The number of parallel browser sessions
+
+    Returns:
+        float: Seconds between memory checks
+    """
+    return 0.25 if max_concurrent > 20 else 2.0
+
+def memory_threshold_percent() -> float:
+    """
+    Picks the MemoryAdaptiveDispatcher memory threshold from the host's total RAM.
+    Small hosts keep more headroom; on large servers the same percentage leaves many GB free.
+
+    Returns:
+        float: Percentage of system memory the crawl may use before throttling
+    """
+    total_gb = psutil.virtual_memory().total / (1 << 30)
+    if total_gb <= 16:
+        return 70.0
+    if total_gb <= 64:
+        return 80.0
+    return 85.0
+
+def run_async(main):
+    """
+    Runs the crawl coroutine on uvloop when it is installed (Linux/macOS), otherwise on asyncio's default loop.
+
+    Args:
+        main: The coroutine to run
+
+    Returns:
+        Whatever the coroutine returns
+    """
+    try:
+        import uvloop
+    except ImportError:
+        return asyncio.run(main)
+    if hasattr(uvloop, "run"):
+        return uvloop.run(main)
+    # uvloop.run() was added in 0.18; older releases only offer the event loop policy
+    uvloop.install()
+    return asyncio.run(main)
+
+def create_filename_from_url(url: str) -> str:
+    """
+    Creates a filename from URL path after the domain
+
+    Args:
+        url (str): The full URL
+
+    Returns:
+        str: Filename for the content
+    """
+    path = urlsplit(url).path
+    # Drop ;params from the last segment, as urlparse would
+    semicolon = path.find(';', max(path.rfind('/'), 0))
+    if semicolon >= 0:
+        path = path[:semicolon]
+
+    # Remove leading slash; remaining slashes become underscores when sanitized
+    if path.startswith('/'):
+        path = path[1:]
+
+    # If path is empty, use 'index'
+    if not path:
+        filename = 'index'
+    else:
+        filename = path.translate(_SANITIZE_TABLE)
+    if not filename.endswith('.md'):
+        filename += '.md'
+
+    return filename
+
+def save_content_to_file(content: str, url: str, base_folder: str):
+    """
+    Saves the scraped content to a file in the specified folder structure.
+
+    Args:
+        content (str): The markdown content to save
+        url (str): The original URL
+        base_folder (str): The base folder name (e.g., 'docs.flowiseai.com'), which must already exist
+    """
+    try:
+        # Generate filename from URL
+        filename = create_filename_from_url(url)
+        filepath = os.path.join(base_folder, filename)
+
+        # Save the content with a raw file descriptor; the page is written whole, so no
+        # buffered text layer is needed
+        data = memoryview(content.encode('utf-8'))
+        fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            while data:
+                written = os.write(fd, data)
+                data = data[written:]
+        finally:
+            os.close(fd)
+
+        logger.info(f"Saved content to: {filepath}")
+
+    except Exception as e:
+        logger.error(f"Error saving content for {url}: {e}")
+
+def extract_domain_from_url(url: str) -> str:
+    """
+    Extracts the domain name from the URL to use as folder name.
+
+    Args:
+        url (str): The URL (a page or a sitemap)
+
+    Returns:
+        str: Domain name to use as folder name
+    """
+    return urlsplit(url).netloc
+
+def iter_sitemap_locs(stream):
+    """
+    Streams the <loc> values out of a sitemap or sitemap index without building the whole tree.
+
+    Args:
+        stream: A file-like object with the raw sitemap XML
+
+    Yields:
+        Tuple[bool, str]: Whether the entry is a child sitemap (from a sitemap index), and its URL
+    """
+    if HAS_LXML:
+        for _, elem in ElementTree.iterparse(stream, tag=SITEMAP_LOC_TAG):
+            parent = elem.getparent()
+            yield parent.tag == SITEMAP_TAG, elem.text
+            elem.clear()
+            # Drop the entries we've already read so memory stays flat
+            while parent.getprevious() is not None:
+                del parent.getparent()[0]
+    else:
+        context = ElementTree.iterparse(stream, events=('start', 'end'))
+        _, root = next(context)
+        is_index = root.tag == SITEMAP_INDEX_TAG
+        for event, elem in context:
+            if event == 'end' and elem.tag == SITEMAP_LOC_TAG:
+                yield is_index, elem.text
+                root.clear()
+
+def _fetch_sitemap(sitemap_url: str) -> Tuple[List[str], List[str]]:
+    """
+    Fetches a single sitemap and splits its entries into page URLs and child sitemap URLs.
+
+    Args:
+        sitemap_url (str): The sitemap URL
+
+    Returns:
+        Tuple[List[str], List[str]]: Page URLs and child sitemap URLs
+    """
+    page_urls = []
+    sitemap_urls = []
+    with _SESSION.get(sitemap_url, stream=True) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        for is_sitemap, loc in iter_sitemap_locs(response.raw):
+            (sitemap_urls if is_sitemap else page_urls).append(loc)
+    return page_urls, sitemap_urls
+
+async def fetch_sitemap_urls(sitemap_url: str) -> List[str]:
+    """
+    Fetches all page URLs listed in a sitemap.
+    If it is a sitemap index, the child sitemaps are fetched in parallel.
+
+    Args:
+        sitemap_url (str): The sitemap URL
+
+    Returns:
+        List[str]: List of URLs, empty if the sitemap could not be fetched
+    """
+    semaphore = asyncio.Semaphore(SITEMAP_FETCH_CONCURRENCY)
+
+    async def fetch(url: str) -> Tuple[List[str], List[str]]:
+        async with semaphore:
+            try:
+                return await asyncio.to_thread(_fetch_sitemap, url)
+            except Exception as e:
+                logger.error(f"Error fetching sitemap {url}: {e}")
+                return [], []
+
+    urls = []
+    seen = {sitemap_url}
+    pending = [asyncio.create_task(fetch(sitemap_url))]
+    while pending:
+        children = []
+        for next_done in asyncio.as_completed(pending):
+            page_urls, sitemap_urls = await next_done
+            urls.extend(page_urls)
+            # Start child sitemaps right away so they overlap with the rest of this level
+            for child_url in sitemap_urls:
+                if child_url not in seen:
+                    seen.add(child_url)
+                    children.append(asyncio.create_task(fetch(child_url)))
+        pending = children
+
+    return urls